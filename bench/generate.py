@@ -0,0 +1,300 @@
+"""
+Seeded generators of large synthetic inputs for the recontig benchmarks.
+
+Writes VCF, SAM, BED, GFF and generic TSV files on a set of UCSC named
+contigs, a mapping of them to ensembl names, and a pair of faidx'd
+fastas whose contigs differ by masking and degenerate nucleotides.
+BCF, bgzipped VCF and BAM copies are made with bcftools/samtools if
+they are installed, else with the recontig binary itself.
+
+    python3 bench/generate.py -o bench/data --records 1000000 --seed 1
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+
+BASES = "ACGT"
+DEGENERATE = "MRSVWYHKDB"
+
+# modifications of a fasta pair, as in tests/data:
+# B hard-masking, C degenerate nucleotides, D soft-masking
+PROFILES = {
+    "raw": [""],
+    "soft": ["D"],
+    "hard": ["B"],
+    "degenerate": ["C"],
+    "mixed": ["", "B", "C", "D", "BC", "BD", "CD", "BCD"],
+}
+
+
+def _contigs(nContigs, contigLength, rng):
+    """ Make contig names and lengths.
+    Input: nContigs - number of mapped contigs, chr1..chrN
+    Input: contigLength - length of the largest contig
+    Input: rng - random.Random
+    Output: list of (name, length), with 1% unmapped chrUn contigs
+    """
+    contigs = []
+    for i in range(nContigs):
+        contigs.append(("chr%d" % (i + 1), max(1000, contigLength * (nContigs - i) // nContigs)))
+    for i in range(max(1, nContigs // 100)):
+        contigs.append(("chrUn_%d" % (i + 1), rng.randint(1000, max(1001, contigLength // 100))))
+    return contigs
+
+
+def _positions(contigs, n, rng):
+    """ Spread n sorted positions over contigs in proportion to their length.
+    Output: generator of (contig, 1-based position)
+    """
+    total = sum(length for _, length in contigs)
+    for name, length in contigs:
+        k = n * length // total
+        for pos in sorted(rng.randrange(1, length) for _ in range(k)):
+            yield name, pos
+
+
+def writeMapping(fn, contigs):
+    """ Write a UCSC to ensembl mapping of the mapped contigs. """
+    with open(fn, "w") as f:
+        for name, _ in contigs:
+            if not name.startswith("chrUn"):
+                f.write("%s\t%s\n" % (name, name[3:]))
+
+
+def writeVcf(fn, contigs, n, samples, rng):
+    """ Write a sorted VCF of about n records with genotypes for samples.
+    Output: number of records written
+    """
+    with open(fn, "w", buffering=1 << 20) as f:
+        f.write("##fileformat=VCFv4.2\n")
+        for name, length in contigs:
+            f.write("##contig=<ID=%s,length=%d>\n" % (name, length))
+        f.write('##INFO=<ID=DP,Number=1,Type=Integer,Description="Depth">\n')
+        f.write('##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">\n')
+        f.write("#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT")
+        f.write("".join("\tS%d" % i for i in range(samples)) + "\n")
+        gts = ["0/0", "0/1", "1/1"]
+        count = 0
+        for name, pos in _positions(contigs, n, rng):
+            count += 1
+            ref = rng.choice(BASES)
+            alt = rng.choice(BASES.replace(ref, ""))
+            f.write("%s\t%d\t.\t%s\t%s\t%d\tPASS\tDP=%d\tGT" % (name, pos, ref, alt, rng.randint(10, 99), rng.randint(1, 100)))
+            f.write("".join("\t" + rng.choice(gts) for _ in range(samples)) + "\n")
+    return count
+
+
+def writeSam(fn, contigs, n, readLength, rng):
+    """ Write a coordinate sorted SAM of about n reads, 1% unplaced.
+    Output: number of reads written
+    """
+    qual = "I" * readLength
+    with open(fn, "w", buffering=1 << 20) as f:
+        f.write("@HD\tVN:1.6\tSO:coordinate\n")
+        for name, length in contigs:
+            f.write("@SQ\tSN:%s\tLN:%d\n" % (name, length))
+        i = -1
+        for i, (name, pos) in enumerate(_positions(contigs, n - n // 100, rng)):
+            seq = "".join(rng.choices(BASES, k=readLength))
+            f.write("r%d\t0\t%s\t%d\t60\t%dM\t*\t0\t0\t%s\t%s\n" % (i, name, pos, readLength, seq, qual))
+        count = i + 1
+        for i in range(n // 100):
+            seq = "".join(rng.choices(BASES, k=readLength))
+            f.write("u%d\t4\t*\t0\t0\t*\t*\t0\t0\t%s\t%s\n" % (i, seq, qual))
+    return count + n // 100
+
+
+def writeBed(fn, contigs, n, rng):
+    """ Write a sorted BED6 of about n intervals.
+    Output: number of records written
+    """
+    with open(fn, "w", buffering=1 << 20) as f:
+        i = -1
+        for i, (name, pos) in enumerate(_positions(contigs, n, rng)):
+            f.write("%s\t%d\t%d\tf%d\t%d\t%s\n" % (name, pos - 1, pos + rng.randint(10, 1000), i, rng.randint(0, 1000), rng.choice("+-")))
+    return i + 1
+
+
+def writeGff(fn, contigs, n, rng):
+    """ Write a sorted GFF3 of about n features.
+    Output: number of records written
+    """
+    with open(fn, "w", buffering=1 << 20) as f:
+        f.write("##gff-version 3\n")
+        i = -1
+        for i, (name, pos) in enumerate(_positions(contigs, n, rng)):
+            f.write("%s\tbench\texon\t%d\t%d\t.\t%s\t.\tID=e%d;Parent=t%d\n" % (name, pos, pos + rng.randint(10, 1000), rng.choice("+-"), i, i // 4))
+    return i + 1
+
+
+def writeTsv(fn, contigs, n, rng):
+    """ Write a generic TSV of about n rows with the contig in column 2.
+    Output: number of records written
+    """
+    with open(fn, "w", buffering=1 << 20) as f:
+        f.write("#id\tcontig\tpos\tvalue\n")
+        i = -1
+        for i, (name, pos) in enumerate(_positions(contigs, n, rng)):
+            f.write("v%d\t%s\t%d\t%.4f\n" % (i, name, pos, rng.random()))
+    return i + 1
+
+
+def _modify(seq, kinds, rng):
+    """ Apply modifications to a contig's sequence, in place.
+    Input: seq - bytearray of the sequence
+    Input: kinds - any of B (hard-mask), C (degenerate), D (soft-mask)
+    """
+    length = len(seq)
+    for kind in kinds:
+        for _ in range(max(1, length // 100000)):
+            size = min(length // 20 + 1, rng.randint(10, 5000))
+            start = rng.randrange(0, length - size)
+            if kind == "B":
+                seq[start:start + size] = b"N" * size
+            elif kind == "C":
+                seq[start:start + size] = bytes(rng.choice(DEGENERATE.encode()) for _ in range(size))
+            elif kind == "D":
+                seq[start:start + size] = seq[start:start + size].lower()
+
+
+def _writeFasta(fn, contigs, lineWidth=60):
+    """ Write a fasta and its .fai.
+    Input: contigs - list of (name, bytearray sequence)
+    """
+    with open(fn, "wb") as f, open(fn + ".fai", "w") as fai:
+        for name, seq in contigs:
+            f.write(b">" + name.encode() + b"\n")
+            offset = f.tell()
+            for i in range(0, len(seq), lineWidth):
+                f.write(seq[i:i + lineWidth] + b"\n")
+            fai.write("%s\t%d\t%d\t%d\t%d\n" % (name, len(seq), offset, lineWidth, lineWidth + 1))
+
+
+def writeFastaPair(fn1, fn2, nContigs, contigLength, profile, rng):
+    """ Write a pair of fastas whose contigs map to each other.
+    The first has UCSC names, the second ensembl names and contigs
+    modified according to profile, cycling through its modifications.
+    Contig lengths are distinct so each contig has one candidate.
+    """
+    kinds = PROFILES[profile]
+    lengths = set()
+    first, second = [], []
+    for i in range(nContigs):
+        length = max(1000, contigLength * (nContigs - i) // nContigs)
+        while length in lengths:
+            length += 1
+        lengths.add(length)
+        seq = bytearray(rng.choices(BASES.encode(), k=length))
+        first.append(("chr%d" % (i + 1), seq))
+        other = bytearray(seq)
+        _modify(other, kinds[i % len(kinds)], rng)
+        second.append(("%d" % (i + 1), other))
+    _writeFasta(fn1, first)
+    _writeFasta(fn2, second)
+
+
+def _compressed(outDir, recontig):
+    """ Make BCF, bgzipped VCF and BAM copies of the text inputs.
+    Output: names of the files written
+    """
+    made = []
+    vcf, sam = os.path.join(outDir, "bench.vcf"), os.path.join(outDir, "bench.sam")
+    identity = os.path.join(outDir, "identity.txt")
+    with open(vcf) as f, open(identity, "w") as out:
+        for line in f:
+            if not line.startswith("##contig=<ID="):
+                if not line.startswith("##"):
+                    break
+                continue
+            name = line[len("##contig=<ID="):].split(",")[0]
+            out.write("%s\t%s\n" % (name, name))
+    for fmt, src, ext, tool, args in [
+            ("vcf", vcf, ".vcf.gz", "bcftools", ["view", "-Oz", "-o"]),
+            ("vcf", vcf, ".bcf", "bcftools", ["view", "-Ob", "-o"]),
+            ("sam", sam, ".bam", "samtools", ["view", "-b", "-o"])]:
+        out = os.path.join(outDir, "bench" + ext)
+        if shutil.which(tool):
+            cmd = [tool] + args + [out, src]
+        elif recontig:
+            # recontig with an identity mapping copies the records
+            outType = "z" if ext.endswith(".gz") else "b"
+            cmd = [recontig, "convert", "-q", "-m", identity, "-f", fmt, "-O", outType,
+                   "-e", os.devnull, "-o", out, src]
+        else:
+            print("Neither %s nor recontig found, not writing %s" % (tool, out), file=sys.stderr)
+            continue
+        subprocess.check_call(cmd)
+        made.append(os.path.basename(out))
+    return made
+
+
+def _getUserArgs():
+    """ Collect user arguments and return an
+    argparse object.
+    """
+    parser = argparse.ArgumentParser(description="generate recontig benchmark inputs")
+    parser.add_argument("--output", "-o", type=str, default="bench/data",
+            help="directory to write the inputs to")
+    parser.add_argument("--seed", type=int, default=1,
+            help="random seed, the same seed gives the same files")
+    parser.add_argument("--records", "-n", type=int, default=1000000,
+            help="records of each VCF/SAM/BED/GFF/TSV")
+    parser.add_argument("--contigs", type=int, default=24,
+            help="mapped contigs of the record files")
+    parser.add_argument("--contig-length", type=int, default=250000000,
+            help="length of the largest contig of the record files")
+    parser.add_argument("--samples", type=int, default=10,
+            help="samples of the VCF")
+    parser.add_argument("--read-length", type=int, default=100,
+            help="read length of the SAM")
+    parser.add_argument("--fasta-contigs", type=int, default=24,
+            help="contigs of each fasta")
+    parser.add_argument("--fasta-length", type=int, default=4000000,
+            help="length of the largest fasta contig")
+    parser.add_argument("--profile", type=str, default="mixed", choices=sorted(PROFILES),
+            help="how the second fasta's contigs differ from the first's")
+    parser.add_argument("--recontig", type=str, default="./recontig",
+            help="recontig binary used to compress inputs if bcftools/samtools are missing")
+    return parser.parse_args()
+
+
+def main():
+    args = _getUserArgs()
+    os.makedirs(args.output, exist_ok=True)
+    rng = random.Random(args.seed)
+    contigs = _contigs(args.contigs, args.contig_length, rng)
+    path = lambda name: os.path.join(args.output, name)
+
+    writeMapping(path("mapping.txt"), contigs)
+    records = {
+        "vcf": writeVcf(path("bench.vcf"), contigs, args.records, args.samples, rng),
+        "sam": writeSam(path("bench.sam"), contigs, args.records, args.read_length, rng),
+        "bed": writeBed(path("bench.bed"), contigs, args.records, rng),
+        "gff": writeGff(path("bench.gff"), contigs, args.records, rng),
+        "tsv": writeTsv(path("bench.tsv"), contigs, args.records, rng),
+        "fasta": args.fasta_contigs,
+    }
+    writeFastaPair(path("ucsc.fa"), path("ensembl.fa"), args.fasta_contigs, args.fasta_length, args.profile, rng)
+    recontig = args.recontig if shutil.which(args.recontig) else None
+    compressed = _compressed(args.output, recontig)
+
+    # read by bench/run.py to compute records/sec
+    manifest = {
+        "seed": args.seed,
+        "records": records,
+        "contigs": len(contigs),
+        "fasta_contigs": args.fasta_contigs,
+        "fasta_length": args.fasta_length,
+        "profile": args.profile,
+        "files": ["bench.vcf", "bench.sam", "bench.bed", "bench.gff", "bench.tsv", "ucsc.fa", "ensembl.fa"] + compressed,
+    }
+    with open(path("manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Benchmark harness for recontig conversions and make-mapping.
+
+Times each benchmark through the CLI and through the python module on
+the inputs written by bench/generate.py, and writes records/sec, MB/s
+and peak RSS as JSON that can be diffed across releases:
+
+    python3 bench/generate.py -o bench/data
+    python3 bench/run.py -d bench/data -o results.json
+    python3 bench/run.py -d bench/data --compare old.json
+
+Peak RSS is the child process's maximum resident set size, so CLI and
+python runs are measured the same way.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# name, input, records key of the manifest,
+# CLI arguments after "recontig", python function and arguments
+# {in} {out} {ej} {mapping} {threads} and friends are filled in per run
+BENCHMARKS = [
+    ("vcf", "bench.vcf", "vcf",
+        ["convert", "-f", "vcf", "-m", "{mapping}", "-t", "{threads}", "-e", "{ej}", "-o", "{out}", "{in}"],
+        ("recontigVcf", ["{in}", "{ej}", "$mapping", "{out}", "", "$threads"])),
+    ("vcf.gz", "bench.vcf.gz", "vcf",
+        ["convert", "-f", "vcf", "-O", "z", "-m", "{mapping}", "-t", "{threads}", "-e", "{ej}", "-o", "{out}", "{in}"],
+        ("recontigVcf", ["{in}", "{ej}", "$mapping", "{out}", "", "$threads", "$z"])),
+    ("bcf", "bench.bcf", "vcf",
+        ["convert", "-f", "bcf", "-O", "b", "-m", "{mapping}", "-t", "{threads}", "-e", "{ej}", "-o", "{out}", "{in}"],
+        ("recontigVcf", ["{in}", "{ej}", "$mapping", "{out}", "", "$threads", "$b"])),
+    ("sam", "bench.sam", "sam",
+        ["convert", "-f", "sam", "-m", "{mapping}", "-t", "{threads}", "-e", "{ej}", "-o", "{out}", "{in}"],
+        ("recontigSam", ["{in}", "{ej}", "$mapping", "{out}", "", "$threads"])),
+    ("bam", "bench.bam", "sam",
+        ["convert", "-f", "bam", "-m", "{mapping}", "-t", "{threads}", "-e", "{ej}", "-o", "{out}", "{in}"],
+        ("recontigBam", ["{in}", "{ej}", "$mapping", "{out}", "", "$threads"])),
+    ("bed", "bench.bed", "bed",
+        ["convert", "-f", "bed", "-m", "{mapping}", "-t", "{threads}", "-e", "{ej}", "-o", "{out}", "{in}"],
+        ("recontigBed", ["{in}", "{ej}", "$mapping", "{out}", "", "$threads"])),
+    ("gff", "bench.gff", "gff",
+        ["convert", "-f", "gff", "-m", "{mapping}", "-t", "{threads}", "-e", "{ej}", "-o", "{out}", "{in}"],
+        ("recontigGff", ["{in}", "{ej}", "$mapping", "{out}", "", "$threads"])),
+    ("generic", "bench.tsv", "tsv",
+        ["convert", "--col", "2", "-m", "{mapping}", "-t", "{threads}", "-e", "{ej}", "-o", "{out}", "{in}"],
+        ("recontigGeneric", ["{in}", "{ej}", 1, "$mapping", "{out}", "\t", "#", "$threads"])),
+    ("make-mapping", "ucsc.fa", "fasta",
+        ["make-mapping", "-t", "{threads}", "-o", "{out}", "{in}", "{fasta2}"],
+        ("makeMapping", ["{in}", "{fasta2}", True, "$threads", "", 2 << 30])),
+]
+
+# run by the python interface in a child process so its
+# peak RSS is measured like the CLI's
+PYTHON_CHILD = """
+import json, sys, time
+import recontig
+spec = json.loads(sys.argv[1])
+mapping = recontig.getContigMapping(spec["mapping"])
+values = {
+    "$mapping": mapping,
+    "$threads": spec["threads"],
+    "$z": recontig.OutputOptions("z", -1, False),
+    "$b": recontig.OutputOptions("b", -1, False),
+}
+args = [values.get(a, a) if isinstance(a, str) else a for a in spec["args"]]
+t = time.perf_counter()
+getattr(recontig, spec["function"])(*args)
+print(json.dumps({"seconds": time.perf_counter() - t}))
+"""
+
+
+def _fill(arg, values):
+    """ Fill in the {placeholders} of a string argument. """
+    return arg.format(**values) if isinstance(arg, str) and not arg.startswith("$") else arg
+
+
+def _wait(cmd):
+    """ Run a command to completion.
+    Output: (wall seconds, peak RSS in MB, stdout)
+    """
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    out = proc.stdout.read()
+    _, status, usage = os.wait4(proc.pid, 0)
+    seconds = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    rss = usage.ru_maxrss / (1 << 20) if sys.platform == "darwin" else usage.ru_maxrss / 1024
+    return seconds, rss, out
+
+
+def _runOnce(interface, bench, values, args):
+    """ Time one run of a benchmark.
+    Output: (seconds, peak RSS in MB)
+    """
+    name, _, _, cli, (function, pyArgs) = bench
+    if interface == "cli":
+        seconds, rss, _ = _wait([args.recontig] + [_fill(a, values) for a in cli])
+        return seconds, rss
+    spec = {
+        "function": function,
+        "args": [_fill(a, values) for a in pyArgs],
+        "mapping": values["mapping"],
+        "threads": args.threads,
+    }
+    _, rss, out = _wait([sys.executable, "-c", PYTHON_CHILD, json.dumps(spec)])
+    return json.loads(out.decode().strip().splitlines()[-1])["seconds"], rss
+
+
+def runBenchmarks(args):
+    """ Run every selected benchmark on every selected interface.
+    Output: list of result dictionaries
+    """
+    with open(os.path.join(args.data, "manifest.json")) as f:
+        manifest = json.load(f)
+    results = []
+    work = tempfile.mkdtemp(prefix="recontig-bench-")
+    try:
+        for bench in BENCHMARKS:
+            name, inputName, recordsKey = bench[:3]
+            fn = os.path.join(args.data, inputName)
+            if args.only and name not in args.only:
+                continue
+            if not os.path.exists(fn):
+                print("Skipping %s, %s was not generated" % (name, fn), file=sys.stderr)
+                continue
+            inputs = [fn]
+            if name == "make-mapping":
+                inputs.append(os.path.join(args.data, "ensembl.fa"))
+            size = sum(os.path.getsize(x) for x in inputs)
+            records = manifest["records"][recordsKey]
+            for interface in args.interfaces:
+                values = {
+                    "in": fn,
+                    "fasta2": os.path.join(args.data, "ensembl.fa"),
+                    "out": os.path.join(work, name + ".out"),
+                    "ej": os.path.join(work, name + ".ejected"),
+                    "mapping": os.path.join(args.data, "mapping.txt"),
+                    "threads": args.threads,
+                }
+                runs = []
+                for _ in range(args.repeat):
+                    runs.append(_runOnce(interface, bench, values, args))
+                seconds = sorted(s for s, _ in runs)[len(runs) // 2]
+                result = {
+                    "name": name,
+                    "interface": interface,
+                    "input_bytes": size,
+                    "records": records,
+                    "seconds": round(seconds, 4),
+                    "all_seconds": [round(s, 4) for s, _ in runs],
+                    "records_per_sec": round(records / seconds, 1),
+                    "mb_per_sec": round(size / (1 << 20) / seconds, 2),
+                    "peak_rss_mb": round(max(r for _, r in runs), 1),
+                }
+                print("%-14s %-6s %8.3fs %12.0f rec/s %8.1f MB/s %8.1f MB RSS" % (name, interface,
+                    seconds, result["records_per_sec"], result["mb_per_sec"], result["peak_rss_mb"]), file=sys.stderr)
+                results.append(result)
+    finally:
+        shutil.rmtree(work)
+    return results
+
+
+def _version(recontig):
+    """ Describe the recontig being benchmarked by its git revision. """
+    try:
+        return subprocess.check_output(["git", "describe", "--always", "--dirty"],
+            cwd=os.path.dirname(os.path.abspath(recontig)), stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(old, new):
+    """ Print the change of each benchmark's rates between two result files.
+    Input: old, new - result dictionaries as written by this script
+    """
+    before = {(r["name"], r["interface"]): r for r in old["results"]}
+    print("%-14s %-6s %12s %12s %12s" % ("benchmark", "iface", "rec/s", "MB/s", "peak RSS"))
+    for r in new["results"]:
+        o = before.get((r["name"], r["interface"]))
+        if o is None:
+            continue
+        ratio = lambda key: "%+.1f%%" % (100.0 * (r[key] - o[key]) / o[key]) if o[key] else "n/a"
+        print("%-14s %-6s %12s %12s %12s" % (r["name"], r["interface"],
+            ratio("records_per_sec"), ratio("mb_per_sec"), ratio("peak_rss_mb")))
+
+
+def _getUserArgs():
+    """ Collect user arguments and return an
+    argparse object.
+    """
+    parser = argparse.ArgumentParser(description="benchmark recontig")
+    parser.add_argument("--data", "-d", type=str, default="bench/data",
+            help="directory of inputs written by bench/generate.py")
+    parser.add_argument("--output", "-o", type=str,
+            help="write results to this JSON file (default: stdout)")
+    parser.add_argument("--recontig", type=str, default="./recontig",
+            help="recontig binary to benchmark")
+    parser.add_argument("--interfaces", type=lambda x: x.split(","), default=["cli", "python"],
+            help="comma separated interfaces to benchmark: cli, python")
+    parser.add_argument("--only", type=lambda x: x.split(","),
+            help="comma separated benchmarks to run: " + ", ".join(b[0] for b in BENCHMARKS))
+    parser.add_argument("--threads", "-t", type=int, default=0,
+            help="BGZF/matching threads passed to recontig")
+    parser.add_argument("--repeat", "-r", type=int, default=3,
+            help="runs of each benchmark, the median time is reported")
+    parser.add_argument("--compare", type=str,
+            help="compare the results with a previous results file")
+    return parser.parse_args()
+
+
+def main():
+    args = _getUserArgs()
+    report = {
+        "recontig": _version(args.recontig),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "threads": args.threads,
+        "results": runBenchmarks(args),
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
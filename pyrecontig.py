@@ -1,6 +1,5 @@
 import os
 import urllib.request
-import pandas as pd
 import recontig
 import argparse
 import sys
@@ -25,24 +24,147 @@ def _getmapping(mappingFile):
     return mapping
 
 
-def _gftRead(url, step):
+# GTF Files by build, used to build a contig length table when asked to.
+_GTFS = {
+    "grch38": {
+        "UCSC": ("http://hgdownload.cse.ucsc.edu/goldenpath/hg38/bigZips/genes/hg38.refGene.gtf.gz", 0),
+        "gencode": ("http://ftp.ebi.ac.uk/pub/databases/gencode/Gencode_human/release_38/gencode.v38.chr_patch_hapl_scaff.annotation.gtf.gz", 0),
+        "ensembl": ("http://ftp.ensembl.org/pub/release-104/gtf/homo_sapiens/Homo_sapiens.GRCh38.104.gtf.gz", 5),
+        "refSeq": ("https://hgdownload.soe.ucsc.edu/goldenPath/hg38/bigZips/genes/hg38.refGene.gtf.gz", 0),
+    },
+}
+
+# Files describing a whole build, the only --lengths that are cached.
+_BUILD_LENGTH_FILES = (".fai", ".dict")
+
+# Most contig length tables kept in the cache.
+_LENGTH_CACHE_ENTRIES = 32
+
+
+def _gtfLengths(url, step):
     """
-        Reads in a gtf file from a specific db given the url.
+        Streams a gtf file from a specific db given the url and
+        records the largest coordinate of each contig.
         Some gft have a certain number of header lines that 
         are skipped however.
         Input: url where gtf is fetched from
-        Input: number of lines to skip while reading in the frame
-        Output: gtf in a pandas frame
+        Input: number of lines to skip
+        Output: dictionary of contig to largest coordinate
+    """
+    lengths = {}
+    with urllib.request.urlopen(url) as response:
+        with gzip.open(response, 'rt') as gtf:
+            for i, line in enumerate(gtf):
+                if i < step or line.startswith("#"):
+                    continue
+                fields = line.split('\t', 5)
+                stop = int(fields[4])
+                if stop > lengths.get(fields[0], 0):
+                    lengths[fields[0]] = stop
+    return lengths
+
+
+def _readContigLengths(fn):
+    """
+        Reads contig lengths from a local file.
+        Input: a .fai, a .dict, a contig length table, or a
+            vcf/bam/sam whose header has contig lengths
+        Output: dictionary of contig to length
+    """
+    lengths = {}
+    if fn.endswith((".bam", ".sam", ".cram")):
+        # header is read by htslib, an empty mapping leaves it untouched
+        lines = recontig.recontigSamHeader(fn, {}).splitlines()
+    else:
+        opener = gzip.open if fn.endswith(".gz") else open
+        with opener(fn, 'rt') as f:
+            lines = []
+            for line in f:
+                # stop at the end of a vcf header
+                if line.startswith("#CHROM"):
+                    break
+                lines.append(line)
+    for line in lines:
+        line = line.rstrip("\n")
+        if line.startswith("@SQ"):
+            # .dict and sam headers
+            tags = dict(x.split(":", 1) for x in line.split("\t")[1:] if ":" in x)
+            if "SN" in tags and "LN" in tags:
+                lengths[tags["SN"]] = int(tags["LN"])
+        elif line.startswith("##contig=<"):
+            tags = dict(x.split("=", 1) for x in line[len("##contig=<"):-1].split(",") if "=" in x)
+            if "ID" in tags and "length" in tags:
+                lengths[tags["ID"]] = int(tags["length"])
+        elif not line.startswith(("#", "@")) and line != "":
+            # .fai and contig length tables
+            fields = line.split("\t")
+            lengths[fields[0]] = int(fields[1])
+    return lengths
+
+
+def _lengthCachePath(build, conversion):
+    """ Path of the cached contig length table for a build in the
+    target naming convention of a conversion.
+    Input: build, i.e. GRCh38
+    Input: conversion, i.e. UCSC2ensembl
+    Output: path in the recontig cache directory, None without
+        a build and conversion
+    """
+    if not build or not conversion:
+        return None
+    return os.path.join(recontig.defaultCacheDir("lengths"),
+            build.lower() + "_" + conversion.split('2')[-1] + ".tsv")
+
+
+def _storeContigLengths(path, lengths):
+    """ Writes a contig length table to the cache then evicts
+    the least recently used tables.
+    Input: path of the table
+    Input: dictionary of contig to length
     """
-    urllib.request.urlretrieve(url, "/tmp/conversion.gtf.gz")
-    gtf = pd.read_csv("/tmp/conversion.gtf.gz",
-            compression = "gzip",
-            engine = "python",
-            delimiter = '\t',
-            skiprows = step,
-            header = None)
+    dirname = os.path.dirname(path)
+    os.makedirs(dirname, exist_ok=True)
+    # write to a temporary file first so readers never see partial tables
+    with open(path + ".tmp", 'w') as f:
+        for contig, length in lengths.items():
+            f.write(contig + "\t" + str(length) + "\n")
+    os.replace(path + ".tmp", path)
+    tables = sorted((os.path.join(dirname, x) for x in os.listdir(dirname) if x.endswith(".tsv")),
+            key=os.path.getmtime, reverse=True)
+    for table in tables[_LENGTH_CACHE_ENTRIES:]:
+        os.remove(table)
 
-    return gtf
+
+def _getContigLengths(args):
+    """ Gets contig lengths for the length check without touching
+    the network unless asked to.
+    Lengths come from --lengths, then the cached table for the
+    build in the target naming convention, then a gtf if
+    --fetch-lengths is set. Tables of a whole build, a .fai, .dict
+    or gtf, are cached for later runs; a file's own header is not.
+    Input: Argparse object
+    Output: dictionary of contig to length, None to check against
+        the converted file's header
+    """
+    path = _lengthCachePath(args.build, args.conversion)
+    if args.lengths:
+        lengths = _readContigLengths(args.lengths)
+        if path and args.lengths.endswith(_BUILD_LENGTH_FILES):
+            _storeContigLengths(path, lengths)
+        return lengths
+    if path and os.path.exists(path):
+        # touch table so eviction is least recently used
+        os.utime(path)
+        return _readContigLengths(path)
+    if path and args.fetch_lengths:
+        target = args.conversion.split('2')[-1]
+        for key, (url, step) in _GTFS.get(args.build.lower(), {}).items():
+            if key in target:
+                lengths = _gtfLengths(url, step)
+                _storeContigLengths(path, lengths)
+                print("Cached contig lengths for " + args.build + " " + target, file = sys.stderr)
+                return lengths
+    return None
 
 def _ungzip(vcf):
     """
@@ -92,58 +214,6 @@ def _createFileOutName(fileName, ext):
 
     return out
  
-def _vcfReadToPandas(vcf):
-    """ Takes a vcf file and reads it into a pandas data frame.
-       Input: vcf file.
-       Output: A list containing two pandas frames. The first containing the
-            vcf header and the second the data.
-    """
-    dataDict = {}
-    finHeadLST = []; finDataLST = []; outLST = []
-    # The vcf is separated into different parts, with the header in one frame 
-    # and the variants in another.
-    for line in vcf:
-        # Add the lines for the vcf header to a separate frame by building
-        # them into dictionaries + lists. After they will be converted below
-        # to the pandas data frame. The same occurs for the data portion of 
-        # the vcf file. 
-        if line.startswith("##"):
-            headDict = {}
-            # Head is used as the name of the header frame column.
-            headDict["head"] = line.strip()
-            finHeadLST.append(headDict)
-        if not line.startswith("##"):
-            header = []
-            if line.startswith("#") and not line.startswith("##"):
-                # Create the header for just the variant frame.
-                header = line.strip().split('\t')
-                dataDict = {key:[] for key in header}
-            else:
-                # All other values are used for the variant frame section.
-                line = line.strip().split('\t')
-                keys = list(dataDict.keys())
-                # In python 3.7 upwards dictionaries maintain order. Here we
-                # fill this in order of lines with retenion to order only noted
-                # to keep an ordered vcf in the output. In other versions of python
-                # an unordered vcf will be output.
-                for cnt in range(0,len(keys)):
-                    dataDict[keys[cnt]] = line[cnt]
-                    if cnt == len(keys)-1:
-                        # Break the duplicte referencing structure by copying 
-                        # the dictionary.
-                        finDataLST.append(dataDict.copy())
-
-    # Set the head frame.
-    headFrame = pd.DataFrame(finHeadLST, columns=["head"])
-    # Set the data frame with specified columns to preserve the order.
-    dataFrame = pd.DataFrame(finDataLST)
-    
-    outLST.append(headFrame)
-    outLST.append(dataFrame)
-    
-    return outLST
-
-
 def _getUserArgs():
     """ Collect user arguments and return an
     argparse object.
@@ -163,106 +233,55 @@ def _getUserArgs():
         help="Name of mapping file")
     parser.add_argument("--output", "-o",type=str,
             help="ouput file", default="-")
+    parser.add_argument("--threads", type=int, default=0,
+            help="number of threads for BGZF compression/decompression")
+    parser.add_argument("--workers", "-w", type=int, default=0,
+            help="convert regions of an indexed bam, bcf or vcf.gz in parallel with this many workers")
+    parser.add_argument("--region-size", type=int, default=64000000,
+            help="size of the regions contigs are split into by --workers, 0 for whole contigs")
+    parser.add_argument("--output-type", "-O", type=str, default="", choices=["", "v", "z", "b"],
+            help="v for uncompressed, z for bgzipped, b for BCF/BAM output")
+    parser.add_argument("--level", "-l", type=int, default=-1,
+            help="compression level 0-9 of compressed output")
+    parser.add_argument("--index", action="store_true",
+            help="index compressed output while writing it")
+    parser.add_argument("--stats", type=str,
+            help="write statistics of the conversion to this file as JSON")
+    parser.add_argument("--lengths", type=str,
+            help="contig lengths for the length check: a .fai, .dict, or vcf/bam with contig lengths in its header")
+    parser.add_argument("--fetch-lengths", action="store_true",
+            help="download a gtf to build the contig length table of --build if it is not cached (GRCh38 only)")
     args = parser.parse_args()
 
     return args
 
 
-def _lengthCheckVcf(pd1, pd2, gft):
+def _reportLengthCheckVcf(report, lengths=None):
     """
-       Uses a gtf file from each respective build and version to determine 
-       the lengths. These are then used as a check for positions that fall out
-       of bounds during the switch. In particular, this is used to check the
-       mitochondion since the build will vary depending on the version and
-       may need to be adjusted.
-       Input: Two pandas frames with pd1 containing the header vcf and pd2 
-            containing the variants.
-       Input: url linking to the gtf file to download.
-       Output: Backfilled pandas frames in a list with position one containing
-            pd1 and position two containing pd2.
+       Reports contigs of a converted vcf with variants past the contig
+       length in the converted header. The per-contig position bounds are
+       tracked by recontig during the conversion.
+       Input: ContigBoundsReport returned by recontig.recontigVcf
+       Input: dictionary of contig to length, None to use the header lengths
+       Output: True if all variants fall within their contigs
     """
-    outLST = []
     print("Checking length of converted contigs for errors", file = sys.stderr)
-    # Sorting the information from the loaded gft
-    chroms = gft.iloc[:,0]
-    starts = gft.iloc[:,3]
-    stops = gft.iloc[:,4]
-
-    pair = []
-    buildDict = {}
-
-    # Add  the keys to the dictionary
-    buildDict = {k:[] for k in chroms}
-
-    # Add the largest range for a start and stop for a componenet as defined by 
-    # given gtf. Nothing thus will fall outside of this range assuming the 
-    # chromosomes have been sucessfully converted over.
-    for i in range(0,len(chroms)):
-        pair = buildDict[chroms[i]]
-
-        # Add only the minimum and maxmimum to the pairing
-        if len(pair) == 0:
-            pair.append(starts[i])
-            pair.append(stops[i])
-        else:
-            if starts[i] < pair[0]:
-                pair[0] = starts[i]
-            if stops[i] > pair[1]:
-                pair[1] = stops[i]
-    print("...sucessfully built max-min dictionary", file = sys.stderr)
-
-    # Sort on chromosome and position columns then reset the index.
-    pd2['POS'] = pd2['POS'].astype('float64')
-    convertedMin = pd2.loc[pd2.groupby('#CHROM')['POS'].idxmin()]
-    convertedMin.rename(columns={'POS':'MIN'}, inplace=True)
-    convertedMax = pd2.loc[pd2.groupby('#CHROM')['POS'].idxmax()]
-    convertedMax.rename(columns={'POS':'MAX'}, inplace=True)   
-    print("...sucessfully built max-min for each contig", file = sys.stderr)
-
-    # Check against the unchanged lengths of the chromosomes in the header
-    contigPd = pd1[pd1['head'].str.contains('##contig=')]
-    contigPd = contigPd['head'].str.split(',', expand=True)
-    chromPd = contigPd.iloc[:, 0].str.split("##contig=<ID=", expand=True)
-    lenPd = contigPd.iloc[:, 1].str.split('=', expand=True)
-    contigPd["#CHROM"] = chromPd.iloc[:, 1]
-    contigPd["#LEN"] = lenPd.iloc[:, 1] 
-    contigPd = contigPd[["#CHROM", "#LEN"]]
-    print("...collected and sorted contig information from file", file = sys.stderr)
-
-    # Sort on the chromosomes to ensure same order for comparison
-    contigPd = contigPd.sort_values('#CHROM', ascending=True)
-    convertedMax = convertedMax.sort_values('#CHROM', ascending=True)
-
-    # The length list for all contigs, this is unchanged from conversion
-    # in the D package, thus is used as a check if length is the same 
-    # for the contigs that have been converted.
-    contigPd = contigPd.iloc[:, 1] 
-    contigsLST = convertedMax['#CHROM'].tolist()
-    lengthLST = contigPd.tolist()
-    convertedMaxLST = convertedMax["MAX"].tolist()
-    print("...generated length lists", file = sys.stderr)
-
-    if not len(lengthLST) == len(convertedMaxLST):
-        print("WARNING: list lengths are not same size in _lengthCheckVcf()", file = sys.stderr)
-        return False
-    
-    for i in range(0,len(lengthLST)):
-        if int(lengthLST[i]) < int(convertedMaxLST[i]):
-            print("WARNING: contig " + contigsLST[i] + " does not match position that is expected in the coverted vcf")
-            print("position before conversion: " + str(lengthLST[i]) + ". After conversion: " + str(convertedMaxLST))
-            print("Coversion contig falls out of original length by " + str(abs(int(lengthLST[i])-int(convertedMaxLST))))
+    maxPos = dict(zip(report.contigs, report.maxPos))
+    if lengths is None:
+        lengths = dict(zip(report.contigs, report.lengths))
+        failed = report.outOfBounds()
+    else:
+        failed = [x for x in report.contigs if lengths.get(x, 0) > 0 and maxPos[x] > lengths[x]]
+    for contig in failed:
+        print("WARNING: contig " + contig + " does not match position that is expected in the coverted vcf")
+        print("contig length: " + str(lengths[contig]) + ". Largest position after conversion: " + str(maxPos[contig]))
+        print("Coversion contig falls out of original length by " + str(maxPos[contig] - lengths[contig]))
     print("...length check done!", file = sys.stderr)
-    
-    return True
+
+    return len(failed) == 0
 
 
 def main():
-    # GRCh38 GTF Files.
-    ucscGft = "http://hgdownload.cse.ucsc.edu/goldenpath/hg38/bigZips/genes/hg38.refGene.gtf.gz" 
-    gencodeGft = "http://ftp.ebi.ac.uk/pub/databases/gencode/Gencode_human/release_38/gencode.v38.chr_patch_hapl_scaff.annotation.gtf.gz"
-    ensemblGft = "http://ftp.ensembl.org/pub/release-104/gtf/homo_sapiens/Homo_sapiens.GRCh38.104.gtf.gz"
-    refseqGft = "https://hgdownload.soe.ucsc.edu/goldenPath/hg38/bigZips/genes/hg38.refGene.gtf.gz"
-    
     # Get arguments from user.
     args = _getUserArgs()
 
@@ -274,46 +293,38 @@ def main():
     # Get dpyryans files for cross-checks.
     # Get mapping
     mapping = {}
-    gft = {} # Empty initialization
     if(args.mapping != None):
         mapping = _getmapping(args.mapping)
     elif(args.build and args.conversion):
         mapping = _getdpyryan(args.build, args.conversion)
-        # Download correct gtf files from the right most argument.
-        whichGtf = args.conversion.split('2')[1]
-        if "UCSC" in whichGtf:
-            gft = _gftRead(ucscGft, 0)
-        elif "gencode" in whichGtf:
-            gft = _gftRead(gencodeGft, 0)
-        elif "ensembl" in whichGtf:
-            gft = _gftRead(ensemblGft, 5)
-        elif "refSeq" in whichGtf:
-            gft = _gftRead(refseqGft, 0)
-        print("Downloaded GTF needed for length checks", file = sys.stderr)
     else:
         raise Exception("Please provide either mapping file or build and conversion")
 
+    output = recontig.OutputOptions(args.output_type, args.level, args.index)
+    stats = recontig.ConversionStats(0.0) if args.stats else None
+
     # For given argument, run the conversion.
     if args.fileType == "vcf":
         # Convert the vcf over to the desired naming convention.
-        recontig.recontigVcf(args.file,"ejected.vcf", mapping, name, "")
-        #convertedVcf = _ungzip(args.output)
-        convertedVcf = open(args.output, 'r')
-        vcfFrame = _vcfReadToPandas(convertedVcf)
+        report = recontig.recontigVcf(args.file,"ejected.vcf", mapping, name, "", args.threads, output, args.workers, args.region_size, stats)
         # Check lengths of vcf after conversion.
-        if _lengthCheckVcf(vcfFrame[0], vcfFrame[1], gft) == True:
+        if report is not None and _reportLengthCheckVcf(report, _getContigLengths(args)) == True:
             print("Length check passed.", file = sys.stderr)
         else:
             print("WARNING: Length check failed.", file = sys.stderr)
 
     elif args.fileType == "bed":
-        recontig.recontigBed(args.file,"ejected.bed",mapping, args.output, "")
+        recontig.recontigBed(args.file,"ejected.bed",mapping, args.output, "", args.threads, output, stats)
     elif args.fileType == "bam":
-        recontig.recontigBam(args.file,"ejected.sam",mapping, args.output, "")
+        recontig.recontigBam(args.file,"ejected.sam",mapping, args.output, "", args.threads, output, args.workers, args.region_size, stats)
     elif args.fileType == "sam":
-        recontig.recontigSam(args.file,"ejected.sam",mapping, args.output, "")
+        recontig.recontigSam(args.file,"ejected.sam",mapping, args.output, "", args.threads, output, args.workers, args.region_size, stats)
     elif args.fileType == "gff":
-        recontig.recontigGff(args.file,"ejected.gff",mapping, args.output, "")
+        recontig.recontigGff(args.file,"ejected.gff",mapping, args.output, "", args.threads, output, stats)
+
+    if stats is not None:
+        with open(args.stats, "w") as f:
+            f.write(stats.to_json())
     
 if __name__ == "__main__":
     main()
@@ -0,0 +1,118 @@
+"""
+Concurrent wrappers around the recontig python package.
+
+recontig's file converters and mapping functions release the GIL while
+they run, so several can run at once on threads of one interpreter.
+
+    with ThreadedRecontig(max_workers=4) as rc:
+        futures = [rc.recontigVcf(fn, fn + ".ejected", mapping, fn + ".out", "") for fn in files]
+        reports = [f.result() for f in futures]
+
+    rc = AsyncRecontig()
+    report = await rc.recontigVcf("in.vcf", "ejected.vcf", mapping, "out.vcf", "")
+
+Only the functions that release the GIL, listed in RELEASES_GIL, can
+be called this way; the others are short and are called directly. Each
+pool thread registers itself with recontig's runtime (attachThread)
+before its first call, and stays registered until it exits.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import recontig
+
+# functions that run without holding the GIL
+RELEASES_GIL = (
+    "recontigVcf",
+    "recontigBed",
+    "recontigGff",
+    "recontigGeneric",
+    "recontigBam",
+    "recontigSam",
+    "getContigMapping",
+    "getDpryan79ContigMapping",
+    "makeMapping",
+    "makeMappings",
+    "makeHeaderMapping",
+    "populateMappingStore",
+    "compileMappingFile",
+    "convert_many",
+    "collectGarbage",
+)
+
+
+def _function(name):
+    """ Look up a recontig function that may run on a pool thread.
+    Output: the function, called after registering its thread
+    """
+    if name not in RELEASES_GIL:
+        raise AttributeError("recontig." + name + " holds the GIL, call it directly")
+    fn = getattr(recontig, name, None)
+    if not callable(fn):
+        raise AttributeError("recontig has no function " + name)
+
+    @functools.wraps(fn)
+    def call(*args, **kwargs):
+        recontig.attachThread()
+        return fn(*args, **kwargs)
+    return call
+
+
+class ThreadedRecontig:
+    """ Calls recontig functions on a thread pool.
+    Input: max_workers - threads of the pool, see ThreadPoolExecutor
+    Input: executor - an existing executor to use instead
+    Output: each recontig function, returning a concurrent.futures.Future
+    """
+    def __init__(self, max_workers=None, executor=None):
+        self._owned = executor is None
+        self.executor = ThreadPoolExecutor(max_workers) if executor is None else executor
+
+    def __getattr__(self, name):
+        fn = _function(name)
+
+        @functools.wraps(fn)
+        def submit(*args, **kwargs):
+            return self.executor.submit(fn, *args, **kwargs)
+        return submit
+
+    def shutdown(self, wait=True):
+        """ Shut down the pool if it was created here. """
+        if self._owned:
+            self.executor.shutdown(wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        return False
+
+
+class AsyncRecontig:
+    """ Calls recontig functions from asyncio without blocking the event loop.
+    Input: executor - executor to run them on, None for the loop's default
+    Output: each recontig function, as a coroutine function
+    """
+    def __init__(self, executor=None):
+        self.executor = executor
+
+    def __getattr__(self, name):
+        fn = _function(name)
+
+        @functools.wraps(fn)
+        async def call(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+        return call
+
+
+async def convert_files_async(jobs, executor=None):
+    """ Run conversions concurrently from asyncio.
+    Input: jobs - (function name, args) pairs, i.e. ("recontigVcf", (fn, ejected, mapping, out, ""))
+    Input: executor - executor to run them on, None for the loop's default
+    Output: results in job order, or the exception a job raised
+    """
+    rc = AsyncRecontig(executor)
+    return await asyncio.gather(*(getattr(rc, name)(*args) for name, args in jobs), return_exceptions=True)
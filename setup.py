@@ -175,6 +175,7 @@ setup(
             **options
         ),
     ],
+    py_modules=["recontig_concurrent"],
     cmdclass={"clean": MyCleaner},
-    requires=["pyd","pandas"]
+    requires=["pyd"]
 )
\ No newline at end of file
@@ -0,0 +1,98 @@
+"""
+Calls recontig functions that release the GIL from python threads that
+exit afterwards, while D collections run. Threads register with the D
+runtime once (attachThread) and stay registered until they exit, so
+objects pyd converts before and after each call stay rooted and a
+collection after the threads are gone doesn't look for them.
+
+Run from the repository root once the python package is installed:
+
+    python tests/python/test_threads.py
+"""
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import recontig
+from recontig_concurrent import ThreadedRecontig
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+
+MAPPING = {"chr1": "1", "chr2": "2", "chrM": "MT"}
+
+# contigs of test1.fa matching baseline.fa, see tests/data/README.md
+BASELINE_2_TEST1 = {"chrA": "A_A", "chrB": "B_A", "chrC": "C_A", "chrD": "D_A",
+    "chrBC": "BC_A", "chrBD": "BD_A", "chrBCD": "BCD_A"}
+
+
+class ShortLivedThreads(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix="recontig-threads-")
+        self.mapping = os.path.join(self.dir, "mapping.txt")
+        with open(self.mapping, "w") as f:
+            for k, v in MAPPING.items():
+                f.write("%s\t%s\n" % (k, v))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _writeVcf(self, name, records):
+        fn = os.path.join(self.dir, name)
+        with open(fn, "w") as f:
+            f.write("##fileformat=VCFv4.2\n")
+            for ctg in ("chr1", "chr2", "chr3"):
+                f.write("##contig=<ID=%s,length=1000>\n" % ctg)
+            f.write("#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n")
+            for i in range(records):
+                f.write("%s\t%d\t.\tA\tC\t.\t.\t.\n" % (("chr1", "chr2", "chr3")[i % 3], i % 900 + 1))
+        return fn
+
+    def test_collect_after_threads_exit(self):
+        results = []
+
+        def run():
+            recontig.attachThread()
+            results.append(recontig.getContigMapping(self.mapping))
+        for _ in range(8):
+            t = threading.Thread(target=run)
+            t.start()
+            t.join()
+        recontig.collectGarbage()
+        self.assertEqual(results, [MAPPING] * 8)
+        self.assertEqual(recontig.getContigMapping(self.mapping), MAPPING)
+
+    def test_concurrent_conversions_with_collections(self):
+        files = [self._writeVcf("in%d.vcf" % i, 3000) for i in range(8)]
+        baseline = os.path.join(DATA, "baseline.fa")
+        test1 = os.path.join(DATA, "test1.fa")
+        with ThreadedRecontig(max_workers=4) as rc:
+            reports = [rc.recontigVcf(fn, fn + ".ejected.vcf", MAPPING, fn + ".out.vcf", "") for fn in files]
+            mappings = [rc.makeMapping(baseline, test1, True, 0, "", 0) for _ in range(4)]
+            loaded = [rc.getContigMapping(self.mapping) for _ in range(8)]
+            # collect while the conversions run and their results are converted
+            while not all(f.done() for f in reports + mappings + loaded):
+                recontig.collectGarbage()
+            reports = [f.result() for f in reports]
+            mappings = [f.result() for f in mappings]
+            loaded = [f.result() for f in loaded]
+        recontig.collectGarbage()
+
+        for report in reports:
+            self.assertEqual(list(report.contigs), ["1", "2"])
+            self.assertEqual(list(report.counts), [1000, 1000])
+            self.assertTrue(report.passed())
+        for mapping in mappings:
+            for k, v in BASELINE_2_TEST1.items():
+                self.assertEqual(mapping[k], v)
+        self.assertEqual(loaded, [MAPPING] * 8)
+
+    def test_held_functions_are_not_pooled(self):
+        with ThreadedRecontig(max_workers=1) as rc:
+            with self.assertRaises(AttributeError):
+                rc.recontigVcfRecord
+
+
+if __name__ == "__main__":
+    unittest.main()